@@ -1,11 +1,21 @@
 import os
 
-from flask import Flask
+from flask import Flask, Response
+
+class JSONResponse(Response):
+    """ Response whose mimetype is application/json unless told otherwise """
+    default_mimetype = "application/json"
 
 app = Flask(__name__)
+app.response_class = JSONResponse
 config_path = os.environ.get("CONFIG_PATH", "posts.config.DevelopmentConfig")
 app.config.from_object(config_path)
 
+# Use orjson for request.json and jsonify when it is installed
+try: from .json_provider import OrJSONProvider
+except ImportError: pass
+else: app.json = OrJSONProvider(app)
+
 from . import api
 
 from .database import Base, engine
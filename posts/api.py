@@ -1,12 +1,16 @@
-import json
+try: import orjson as json
+except ImportError: import json # Fall back to the standard library encoder
+from collections import OrderedDict
+import threading
 
-from flask import request, Response, url_for
-from jsonschema import validate, ValidationError
+from flask import request, stream_with_context
+from jsonschema import ValidationError
+from sqlalchemy import delete, event, select, update
 
 from . import models
 from . import decorators
-from posts import app
-from .database import session
+from posts import app, JSONResponse
+from .database import Session, session
 
 
 # JSON Schema describing the structure of a post
@@ -18,6 +22,84 @@ post_schema = {
     "required": ["title", "body"]
 }
 
+_REQUIRED = tuple(post_schema["required"])
+
+def validate_post(data):
+    """
+    Check data against post_schema without walking the schema. Reports the
+    error jsonschema.validate would pick: a missing property before a
+    property of the wrong type. Unlike post_schema, data which isn't an
+    object is rejected too
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("{!r} is not of type 'object'".format(data))
+    for key in _REQUIRED:
+        if key not in data:
+            raise ValidationError("{!r} is a required property".format(key))
+    for key in _REQUIRED:
+        if not isinstance(data[key], str):
+            raise ValidationError(
+                "{!r} is not of type 'string'".format(data[key]))
+
+
+# Location of a single post, used instead of building it with url_for
+POST_URL = "/api/posts/{}"
+
+
+def not_found(id):
+    """ 404 response for a post which doesn't exist """
+    data = b'{"message":"Could not find post with id %d"}' % id
+    return JSONResponse(data, 404)
+
+
+class PostCache(object):
+    """
+    Serialized posts keyed by id, holding the `size` most recently used
+    posts. Missing posts aren't cached. Clearing the cache starts a new
+    generation, and a post read in an earlier generation is never stored
+    """
+    def __init__(self, size):
+        self.size = size
+        self.posts = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, id):
+        """ The post with the given id as JSON. Raises KeyError if missing """
+        with self.lock:
+            if id in self.posts:
+                self.posts.move_to_end(id)
+                return self.posts[id]
+            generation = self.generation
+
+        post = session.query(models.Post).get(id)
+        if not post:
+            raise KeyError(id)
+        data = json.dumps(post.as_dictionary())
+
+        with self.lock:
+            # A change committed while the post was being read clears the
+            # cache, so the post may be stale and isn't stored
+            if self.generation == generation:
+                self.posts[id] = data
+                if len(self.posts) > self.size:
+                    self.posts.popitem(last=False)
+        return data
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.posts.clear()
+
+post_cache = PostCache(4096)
+
+
+@event.listens_for(Session, "after_commit")
+def clear_post_cache(committed):
+    """ Clear the post cache once a change to the posts has been committed """
+    if committed.info.pop("posts_changed", False):
+        post_cache.clear()
+
 
 @app.route("/api/posts", methods=["GET"])
 @decorators.accept("application/json")
@@ -29,53 +111,65 @@ def posts_get():
     content_like = request.args.get("content_like")
     
     # Get and filter the posts from the database
-    posts = session.query(models.Post)
+    # Only the columns are selected, so no Post objects are built
+    query = select(models.Post.id, models.Post.title, models.Post.body)
     if title_like:
-        posts = posts.filter(models.Post.title.contains(title_like))
+        query = query.where(models.Post.title.contains(title_like))
     if content_like:
-        posts = posts.filter(models.Post.body.contains(content_like))
-                                        
-    posts = posts.order_by(models.Post.id)
-    
-     # Convert the posts to JSON and return a response
-    data = json.dumps([post.as_dictionary() for post in posts])
-    return Response(data, 200, mimetype="application/json")
+        query = query.where(models.Post.body.contains(content_like))
+
+    # Read the rows through a server-side cursor, 500 at a time
+    query = query.order_by(models.Post.id).execution_options(
+        stream_results=True, yield_per=500)
+
+    def generate():
+        """ Stream the posts as a JSON array, one post at a time """
+        yield b"["
+        for i, (id, title, body) in enumerate(session.execute(query)):
+            if i:
+                yield b","
+            yield json.dumps({"id": id, "title": title, "body": body})
+        yield b"]"
+
+    # Convert the posts to JSON and return a response
+    # The request context is kept until the stream ends, so the session's
+    # transaction is only ended once the posts have been read
+    return JSONResponse(stream_with_context(generate()), 200)
     
 @app.route("/api/posts/<int:id>", methods=["GET"])
 @decorators.accept("application/json")
 def post_get(id):
     """ Single post endpoint """
-    # Get the post from the database
-    post = session.query(models.Post).get(id)
-
-    # Check whether the post exists
-    # If not return a 404 with a helpful message
-    if not post:
-        message = "Could not find post with id {}".format(id)
-        data = json.dumps({"message": message})
-        return Response(data, 404, mimetype="application/json")
+    # Get the post as JSON, from the cache or the database
+    # If it doesn't exist return a 404 with a helpful message
+    try:
+        data = post_cache.get(id)
+    except KeyError:
+        return not_found(id)
 
     # Return the post as JSON
-    data = json.dumps(post.as_dictionary())
-    return Response(data, 200, mimetype="application/json")
+    return JSONResponse(data, 200)
     
 @app.route('/api/posts/<int:id>', methods=['DELETE'])
 @decorators.accept("application/json")
 def post_delete(id):
     """ delete a post """
 
-    post = session.query(models.Post).get(id)
-    
-    if not post:
-        message = "Could not find post with id {}".format(id)
-        data = json.dumps({"message": message})
-        return Response(data, 404, mimetype="application/json")
-    
-    session.delete(post)
+    # Delete the post in a single statement, without loading it first
+    deleted = session.execute(
+        delete(models.Post)
+        .where(models.Post.id == id)
+        .returning(models.Post.id)
+    ).fetchone()
+
+    if deleted is None:
+        return not_found(id)
+    session.info["posts_changed"] = True
+
     message = "Deleted post with id {}".format(id)
     data = json.dumps({"message": message})
     
-    return Response(data, 200, mimetype="application/json")
+    return JSONResponse(data, 200)
 
 @app.route("/api/posts", methods=["POST"])
 @decorators.accept("application/json")
@@ -85,22 +179,22 @@ def posts_post():
     data = request.json
     
     try:
-        validate(data, post_schema)
+        validate_post(data)
     except ValidationError as error:
         data = {"message": error.message}
-        return Response(json.dumps(data), 422, mimetype="application/json")
+        return JSONResponse(json.dumps(data), 422)
 
     # Add the post to the database
     post = models.Post(title=data["title"], body=data["body"])
     session.add(post)
-    session.commit()
+    # Flush to get the post's id; the commit happens after the view returns
+    session.flush()
 
     # Return a 201 Created, containing the post as JSON and with the
     # Location header set to the location of the post
     data = json.dumps(post.as_dictionary())
-    headers = {"Location": url_for("post_get", id=post.id)}
-    return Response(data, 201, headers=headers,
-                    mimetype="application/json")
+    headers = {"Location": POST_URL.format(post.id)}
+    return JSONResponse(data, 201, headers=headers)
                     
                     
                     
@@ -112,21 +206,26 @@ def post_put(id):
     data = request.json
     
     try:
-        validate(data, post_schema)
+        validate_post(data)
     except ValidationError as error:
         data = {"message": error.message}
-        return Response(json.dumps(data), 422, mimetype="application/json")
+        return JSONResponse(json.dumps(data), 422)
 
-    # Add the post to the database
-    post = session.query(models.Post).get(id)
-    post.body = data["body"]
-    post.title = data["title"]
-    session.add(post)
-    session.commit()
+    # Update the post in the database with a single statement
+    post = session.execute(
+        update(models.Post)
+        .where(models.Post.id == id)
+        .values(title=data["title"], body=data["body"])
+        .returning(models.Post.id, models.Post.title, models.Post.body)
+    ).fetchone()
+
+    if post is None:
+        return not_found(id)
+    session.info["posts_changed"] = True
 
     # Return a 202 Accepted, containing the post as JSON and with the
     # Location header set to the location of the post
-    data = json.dumps(post.as_dictionary())
-    headers = {"Location": url_for("post_get", id=post.id)}
-    return Response(data, 202, headers=headers,
-                    mimetype="application/json")
\ No newline at end of file
+    post_id, title, body = post
+    data = json.dumps({"id": post_id, "title": title, "body": body})
+    headers = {"Location": POST_URL.format(post_id)}
+    return JSONResponse(data, 202, headers=headers)
\ No newline at end of file
@@ -1,10 +1,33 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 from posts import app
 
 engine = create_engine(app.config["DATABASE_URI"])
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
-session = Session()
+# Objects stay readable once their request's session has been removed
+Session = sessionmaker(bind=engine, expire_on_commit=False)
+# Each thread, and so each request, gets its own session
+session = scoped_session(Session)
+
+@app.after_request
+def commit_session(response):
+    """
+    Commit the changes made during a request before its response is sent, so
+    a failed commit is handled like any other error in the request
+    """
+    if response.status_code < 500:
+        session.commit()
+    return response
+
+@app.teardown_request
+def remove_session(exception=None):
+    """
+    Discard the request's session once it has finished, rolling back the
+    changes of a failed request or the reads of a streamed response
+    """
+    try:
+        session.remove()
+    except Exception:
+        app.logger.exception("Could not remove the session")
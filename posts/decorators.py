@@ -1,7 +1,9 @@
 import json
 from functools import wraps
 
-from flask import request, Response
+from flask import request
+
+from posts import JSONResponse
 
 def accept(mimetype):
     def decorator(func):
@@ -15,7 +17,7 @@ def accept(mimetype):
                 return func(*args, **kwargs)
             message = "Request must accept {} data".format(mimetype)
             data = json.dumps({"message": message})
-            return Response(data, 406, mimetype="application/json")
+            return JSONResponse(data, 406)
         return wrapper
     return decorator
     
@@ -31,6 +33,6 @@ def require(mimetype):
                 return func(*args, **kwargs)
             message = "Request must contain {} data".format(mimetype)
             data = json.dumps({"message": message})
-            return Response(data, 415, mimetype="application/json")
+            return JSONResponse(data, 415)
         return wrapper
     return decorator
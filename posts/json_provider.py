@@ -0,0 +1,24 @@
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+class OrJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider which uses orjson to parse request bodies and serialize
+    data passed to Flask's JSON helpers
+
+    sort_keys and indent are honoured, but any indent is rendered as two
+    spaces. separators and ensure_ascii are ignored: output is always compact
+    UTF-8 unless indented. Keys which aren't strings are converted to strings,
+    as the standard library does.
+    """
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        default = kwargs.get("default", self.default)
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
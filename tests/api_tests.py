@@ -4,12 +4,16 @@ import json
 try: from urllib.parse import urlparse
 except ImportError: from urlparse import urlparse # Python 2 compatibility
 
+from flask import jsonify
+
 # Configure our app to use the testing databse
 os.environ["CONFIG_PATH"] = "posts.config.TestingConfig"
 
 from posts import app
 from posts import models
+from posts.api import post_cache
 from posts.database import Base, engine, session
+from posts.json_provider import OrJSONProvider
 
 class TestAPI(unittest.TestCase):
     """ Tests for the posts API """
@@ -24,6 +28,8 @@ class TestAPI(unittest.TestCase):
     def tearDown(self):
         """ Test teardown """
         session.close()
+        # Post ids are reused once the tables are recreated
+        post_cache.clear()
         # Remove the tables and their data from the database
         Base.metadata.drop_all(engine)
         
@@ -133,9 +139,60 @@ class TestAPI(unittest.TestCase):
         response = self.client.delete("/api/posts/{}".format(postB.id),
                             headers=[("Accept", "application/json")]
                             )
+        self.assertEqual(response.status_code, 200)
         data = json.loads(response.data.decode("ascii"))
         self.assertEqual(data["message"], "Deleted post with id 1")
+
+        # The delete should have been committed to the database
+        posts = session.query(models.Post).all()
+        self.assertEqual(len(posts), 0)
         
+    def test_get_deleted_post(self):
+        """ Getting a post which has been deleted since it was last read """
+        postA = models.Post(title="Example Post A", body="Just a test")
+
+        session.add(postA)
+        session.commit()
+
+        response = self.client.get("/api/posts/{}".format(postA.id),
+                                    headers=[("Accept", "application/json")]
+                                    )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.delete("/api/posts/{}".format(postA.id),
+                            headers=[("Accept", "application/json")]
+                            )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/posts/1",
+                                    headers=[("Accept", "application/json")]
+                                    )
+        self.assertEqual(response.status_code, 404)
+
+        data = json.loads(response.data.decode("ascii"))
+        self.assertEqual(data["message"], "Could not find post with id 1")
+
+    def test_get_post_added_after_miss(self):
+        """ Getting a post which didn't exist when it was last requested """
+        response = self.client.get("/api/posts/1",
+                                    headers=[("Accept", "application/json")]
+                                    )
+        self.assertEqual(response.status_code, 404)
+
+        postA = models.Post(title="Example Post A", body="Just a test")
+
+        session.add(postA)
+        session.commit()
+
+        response = self.client.get("/api/posts/1",
+                                    headers=[("Accept", "application/json")]
+                                    )
+        self.assertEqual(response.status_code, 200)
+
+        post = json.loads(response.data.decode("ascii"))
+        self.assertEqual(post["title"], "Example Post A")
+        self.assertEqual(post["body"], "Just a test")
+
     def test_delete_nonexistent_post(self):
         """ delete a post """
         
@@ -147,7 +204,29 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         data = json.loads(response.data.decode("ascii"))
         self.assertEqual(data["message"], "Could not find post with id 1")
-        
+
+    def test_edit_nonexistent_post(self):
+        """ Editing a post which doesn't exist """
+        data = {
+            "title": "Modified Test",
+            "body": "Modified Content"
+        }
+
+        #attempt to edit post with arbitrary id 1
+        response = self.client.put("/api/posts/{}".format(1),
+            data=json.dumps(data),
+            content_type="application/json",
+            headers=[("Accept", "application/json")]
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.mimetype, "application/json")
+        data = json.loads(response.data.decode("ascii"))
+        self.assertEqual(data["message"], "Could not find post with id 1")
+
+        posts = session.query(models.Post).all()
+        self.assertEqual(len(posts), 0)
+
     def test_get_posts_with_title(self):
         """ Filtering posts by title """
         postA = models.Post(title="Post with bells", body="Just a test")
@@ -309,7 +388,56 @@ class TestAPI(unittest.TestCase):
 
         data = json.loads(response.data.decode("ascii"))
         self.assertEqual(data["message"], "'body' is a required property")
-        
+
+    def test_missing_title_and_invalid_body(self):
+        """ Posting a post with a missing title and an invalid body """
+        data = {
+            "body": 32
+        }
+
+        response = self.client.post("/api/posts",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers=[("Accept", "application/json")]
+        )
+
+        self.assertEqual(response.status_code, 422)
+
+        data = json.loads(response.data.decode("ascii"))
+        self.assertEqual(data["message"], "'title' is a required property")
+
+    def test_invalid_title_and_missing_body(self):
+        """ Posting a post with an invalid title and a missing body """
+        data = {
+            "title": 1
+        }
+
+        response = self.client.post("/api/posts",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers=[("Accept", "application/json")]
+        )
+
+        self.assertEqual(response.status_code, 422)
+
+        data = json.loads(response.data.decode("ascii"))
+        self.assertEqual(data["message"], "'body' is a required property")
+
+    def test_non_object_data(self):
+        """ Posting a post which isn't a JSON object """
+        data = [1]
+
+        response = self.client.post("/api/posts",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers=[("Accept", "application/json")]
+        )
+
+        self.assertEqual(response.status_code, 422)
+
+        data = json.loads(response.data.decode("ascii"))
+        self.assertEqual(data["message"], "[1] is not of type 'object'")
+
     def test_edit_post(self):
         """ Editing an existing post """
         #start by creating a post to edit and verifying that it worked
@@ -352,6 +480,70 @@ class TestAPI(unittest.TestCase):
         post = posts[0]
         self.assertEqual(post.title, "Modified Test")
         self.assertEqual(post.body, "Modified Content")
-    
+
+    def test_get_edited_post(self):
+        """ Getting a post which has been edited since it was last read """
+        postA = models.Post(title="Example Post A", body="Just a test")
+
+        session.add(postA)
+        session.commit()
+
+        response = self.client.get("/api/posts/{}".format(postA.id),
+                                    headers=[("Accept", "application/json")]
+                                    )
+        self.assertEqual(response.status_code, 200)
+
+        data = {
+            "title": "Modified Test",
+            "body": "Modified Content"
+        }
+
+        response = self.client.put("/api/posts/1",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers=[("Accept", "application/json")]
+        )
+        self.assertEqual(response.status_code, 202)
+
+        response = self.client.get("/api/posts/1",
+                                    headers=[("Accept", "application/json")]
+                                    )
+        self.assertEqual(response.status_code, 200)
+
+        post = json.loads(response.data.decode("ascii"))
+        self.assertEqual(post["title"], "Modified Test")
+        self.assertEqual(post["body"], "Modified Content")
+
+    def test_jsonify_sorts_keys(self):
+        """ jsonify sorts keys unless told not to """
+        self.assertIsInstance(app.json, OrJSONProvider)
+        with app.app_context():
+            data = jsonify({"b": 1, "a": 2}).get_data(as_text=True)
+            unsorted = app.json.dumps({"b": 1, "a": 2}, sort_keys=False)
+
+        self.assertEqual(json.loads(data), {"a": 2, "b": 1})
+        self.assertLess(data.index('"a"'), data.index('"b"'))
+        self.assertLess(unsorted.index('"b"'), unsorted.index('"a"'))
+
+    def test_jsonify_non_string_keys(self):
+        """ jsonify converts keys which aren't strings to strings """
+        with app.app_context():
+            data = jsonify({1: "one", 2: "two"}).get_data(as_text=True)
+
+        self.assertEqual(json.loads(data), {"1": "one", "2": "two"})
+
+    def test_malformed_json(self):
+        """ Posting a body which isn't valid JSON """
+        response = self.client.post("/api/posts",
+            data="{not json",
+            content_type="application/json",
+            headers=[("Accept", "application/json")]
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+        posts = session.query(models.Post).all()
+        self.assertEqual(len(posts), 0)
+
 if __name__ == "__main__":
     unittest.main()